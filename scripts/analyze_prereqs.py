@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import argparse
-import json
 import re
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Tuple
+
+from jsonio import dump_json, load_json
+from patterns import assert_compiled
 
 
 COURSE_TOKEN = re.compile(r"\b([A-Z]{2,4})\s*(\d{2,3}[A-Z]?)\b")
@@ -11,19 +13,7 @@ NONE_PATTERNS = [
     re.compile(r"no prerequisites", re.IGNORECASE),
     re.compile(r"prerequisite[s]?:\s*none\b", re.IGNORECASE),
 ]
-
-
-def is_none_text(text: str) -> bool:
-    t = text.strip()
-    return any(p.search(t) for p in NONE_PATTERNS)
-
-
-def extract_course_refs(text: str) -> List[str]:
-    refs = []
-    for m in COURSE_TOKEN.finditer(text):
-        subject, number = m.group(1), m.group(2)
-        refs.append(f"{subject} {number}")
-    return refs
+NONE_RE = re.compile("|".join(p.pattern for p in NONE_PATTERNS), re.IGNORECASE)
 
 
 NON_COURSE_KEYWORDS = [
@@ -34,27 +24,50 @@ NON_COURSE_KEYWORDS = [
     r"registration", r"concurrent", r"co-requisite", r"corequisite",
     r"department", r"instructor",
 ]
+NON_COURSE_RE = re.compile("|".join(NON_COURSE_KEYWORDS), re.IGNORECASE)
+
+# Punctuation, conjunctions and quantifiers stripped in one pass by _only_courses_left
+_CONNECTORS_RE = re.compile(
+    r"[(),.;]|\b(?:and|or|and/or|either|both|one of|two of|with|credit in|at\s+least)\b",
+    re.IGNORECASE,
+)
+_WS_RE = re.compile(r"\s+")
+_COURSE_ONLY_RE = re.compile(r"(?:COURSE\s*)+")
+
+assert_compiled(COURSE_TOKEN, *NONE_PATTERNS, NONE_RE, NON_COURSE_RE, _CONNECTORS_RE, _WS_RE, _COURSE_ONLY_RE)
+
 
 def has_non_course_requirements(text: str) -> bool:
-    t = text.lower()
-    return any(re.search(k, t) for k in NON_COURSE_KEYWORDS)
+    return NON_COURSE_RE.search(text) is not None
+
+
+def _only_courses_left(placeholder: str) -> bool:
+    # Remove punctuation, conjunctions and common quantifiers, then collapse whitespace
+    simplified = _WS_RE.sub(" ", _CONNECTORS_RE.sub(" ", placeholder)).strip()
+    # If empty or only words like COURSE left, treat as course-only
+    return simplified == "" or _COURSE_ONLY_RE.fullmatch(simplified) is not None
 
 
-def is_course_only(text: str) -> bool:
+def classify(text: str) -> Tuple[bool, bool, List[str]]:
+    # Returns (is_none, is_course_only, course refs). Course tokens are scanned once and
+    # the same matches yield both the refs and the COURSE placeholder string.
     t = text.strip()
+    if not t or NONE_RE.search(t):
+        return True, False, []
     if has_non_course_requirements(t):
-        return False
-    # Remove course tokens, then see if any nontrivial tokens remain besides basic connectors
-    placeholder = COURSE_TOKEN.sub("COURSE", t)
-    # Remove conjunctions and punctuation
-    simplified = re.sub(r"[(),.;]", " ", placeholder)
-    simplified = re.sub(r"\b(and|or|and/or|either|both|one of|two of|with|credit in)\b", " ", simplified, flags=re.IGNORECASE)
-    # Remove common quantifiers
-    simplified = re.sub(r"\b(at\s+least)\b", " ", simplified, flags=re.IGNORECASE)
-    # Collapse whitespace
-    simplified = re.sub(r"\s+", " ", simplified).strip()
-    # If empty or only words like COURSE left, treat as course-only
-    return simplified == "" or re.fullmatch(r"(COURSE\s*)+", simplified) is not None
+        return False, False, []
+    refs: List[str] = []
+    parts: List[str] = []
+    pos = 0
+    for m in COURSE_TOKEN.finditer(t):
+        parts.append(t[pos:m.start()])
+        parts.append("COURSE")
+        pos = m.end()
+        refs.append(f"{m.group(1)} {m.group(2)}")
+    parts.append(t[pos:])
+    if _only_courses_left("".join(parts)):
+        return False, True, refs
+    return False, False, []
 
 
 def analyze(courses: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
@@ -66,18 +79,16 @@ def analyze(courses: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]
 
     for c in courses:
         prereq = c.get("prerequisites") or ""
-        if not prereq.strip():
-            results["none"].append(c)
-            continue
-        if is_none_text(prereq):
+        none, course_only, refs = classify(prereq)
+        if none:
             results["none"].append(c)
             continue
-        if is_course_only(prereq):
+        if course_only:
             results["course_only"].append({
                 "index": c.get("index"),
                 "name": c.get("name"),
                 "prerequisites": prereq,
-                "courses": extract_course_refs(prereq),
+                "courses": refs,
             })
         else:
             results["remaining"].append({
@@ -94,19 +105,15 @@ def main() -> int:
     ap.add_argument("--outdir", default="data/analysis", help="Output directory")
     args = ap.parse_args()
 
-    with open(args.input, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_json(args.input)
 
     res = analyze(data)
 
     import os
     os.makedirs(args.outdir, exist_ok=True)
-    with open(os.path.join(args.outdir, "none.json"), "w", encoding="utf-8") as f:
-        json.dump(res["none"], f, ensure_ascii=False, indent=2)
-    with open(os.path.join(args.outdir, "course_only.json"), "w", encoding="utf-8") as f:
-        json.dump(res["course_only"], f, ensure_ascii=False, indent=2)
-    with open(os.path.join(args.outdir, "remaining.json"), "w", encoding="utf-8") as f:
-        json.dump(res["remaining"], f, ensure_ascii=False, indent=2)
+    dump_json(res["none"], os.path.join(args.outdir, "none.json"))
+    dump_json(res["course_only"], os.path.join(args.outdir, "course_only.json"))
+    dump_json(res["remaining"], os.path.join(args.outdir, "remaining.json"))
 
     print(f"none: {len(res['none'])}")
     print(f"course_only: {len(res['course_only'])}")
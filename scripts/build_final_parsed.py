@@ -4,7 +4,9 @@ import json
 import os
 import re
 import sys
-from typing import Any, Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 
 
 # Ensure we can import sibling script
@@ -12,7 +14,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 if SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
 
+from jsonio import dump_json, load_json  # type: ignore
 from parse_course_prereqs import parse_prereq_text  # type: ignore
+from patterns import assert_compiled  # type: ignore
 
 
 COURSE_TOKEN = re.compile(r"\b([A-Z]{2,4})\s*(\d{2,3}[A-Z]?)\b")
@@ -27,15 +31,9 @@ NON_COURSE_KEYWORDS = [
     r"department", r"instructor",
 ]
 
-
-def has_course_token(s: str) -> bool:
-    return COURSE_TOKEN.search(s) is not None
-
-
-def detect_flags(text: str) -> List[str]:
-    t = text.lower()
-    flags: List[str] = []
-    mapping = [
+FLAG_RES = [
+    (re.compile(pat, re.IGNORECASE), name)
+    for pat, name in [
         (r"consent|permission|approval", "CONSENT"),
         (r"standing|senior|junior|sophomore|freshman", "STANDING"),
         (r"major|minor|program|restricted|enrollment|enrolled", "MAJOR_OR_PROGRAM"),
@@ -43,59 +41,87 @@ def detect_flags(text: str) -> List[str]:
         (r"concurrent|co-requisite|corequisite", "COREQ_ALLOWED"),
         (r"department|instructor", "DEPT_OR_INSTRUCTOR"),
     ]
-    for pat, name in mapping:
-        if re.search(pat, t):
+]
+
+assert_compiled(COURSE_TOKEN, CLAUSE_SPLIT_RE, *(pat for pat, _ in FLAG_RES))
+
+
+@lru_cache(maxsize=None)
+def has_course_token(s: str) -> bool:
+    return COURSE_TOKEN.search(s) is not None
+
+
+# Prerequisite strings repeat heavily across the catalog ("Consent of instructor.",
+# single-course prereqs, ...), so flag each distinct string only once
+# (parse_prereq_text memoizes itself). Cached results must not be mutated.
+@lru_cache(maxsize=None)
+def detect_flags(text: str) -> List[str]:
+    flags: List[str] = []
+    for pat, name in FLAG_RES:
+        if pat.search(text):
             flags.append(name)
     return sorted(set(flags))
 
 
+def _process(c: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    raw = (c.get("prerequisites") or "").strip()
+    ast = parse_prereq_text(raw)
+
+    hard = ast.get("hard") if isinstance(ast, dict) else {"op": "EMPTY"}
+    coreq_ok = ast.get("coreq_ok") if isinstance(ast, dict) else {"op": "EMPTY"}
+    delta = {
+        "hard_nonempty": int(bool(hard and hard.get("op") != "EMPTY")),
+        "coreq_nonempty": int(bool(coreq_ok and coreq_ok.get("op") != "EMPTY")),
+    }
+
+    # Capture non-course clauses for reference
+    notes: List[str] = []
+    if raw:
+        clauses = [s for s in (cl.strip() for cl in CLAUSE_SPLIT_RE.split(raw)) if s]
+        for cl in clauses:
+            if not has_course_token(cl) or detect_flags(cl):
+                notes.append(cl)
+
+    record = {
+        "index": c.get("index"),
+        "name": c.get("name"),
+        "description": c.get("description"),
+        "prerequisites": {
+            "raw": raw or None,
+            "hard": hard,
+            "coreq_ok": coreq_ok,
+            "flags": detect_flags(raw) if raw else [],
+            "notes": notes,
+        },
+    }
+    return record, delta
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Build final parsed JSON for all courses")
     ap.add_argument("input", nargs="?", default="data/courses.json", help="Input courses.json")
     ap.add_argument("--output", default="data/courses_parsed.json", help="Output JSON path")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes for parsing (1 = serial)")
     args = ap.parse_args()
 
-    with open(args.input, "r", encoding="utf-8") as f:
-        courses = json.load(f)
+    courses = load_json(args.input)
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            results = list(ex.map(_process, courses, chunksize=256))
+    else:
+        results = [_process(c) for c in courses]
 
     out: List[Dict[str, Any]] = []
     stats = {"total": 0, "hard_nonempty": 0, "coreq_nonempty": 0}
-    for c in courses:
+    for record, delta in results:
+        out.append(record)
         stats["total"] += 1
-        raw = (c.get("prerequisites") or "").strip()
-        ast = parse_prereq_text(raw)
-
-        hard = ast.get("hard") if isinstance(ast, dict) else {"op": "EMPTY"}
-        coreq_ok = ast.get("coreq_ok") if isinstance(ast, dict) else {"op": "EMPTY"}
-        if hard and hard.get("op") != "EMPTY":
-            stats["hard_nonempty"] += 1
-        if coreq_ok and coreq_ok.get("op") != "EMPTY":
-            stats["coreq_nonempty"] += 1
-
-        # Capture non-course clauses for reference
-        notes: List[str] = []
-        if raw:
-            clauses = [s.strip() for s in CLAUSE_SPLIT_RE.split(raw) if s.strip()]
-            for cl in clauses:
-                if not has_course_token(cl) or detect_flags(cl):
-                    notes.append(cl)
-
-        out.append({
-            "index": c.get("index"),
-            "name": c.get("name"),
-            "description": c.get("description"),
-            "prerequisites": {
-                "raw": raw or None,
-                "hard": hard,
-                "coreq_ok": coreq_ok,
-                "flags": detect_flags(raw) if raw else [],
-                "notes": notes,
-            },
-        })
+        for k, v in delta.items():
+            stats[k] += v
 
     os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    dump_json(out, args.output)
 
     print(json.dumps(stats))
     return 0
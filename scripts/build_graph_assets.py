@@ -1,32 +1,51 @@
 #!/usr/bin/env python3
 import argparse
-import json
-import math
 import os
-from typing import Any, Dict, List, Tuple
+import sys
+from typing import Any, Dict, List, Optional, Tuple
 
 import networkx as nx
+import numpy as np
+
+from jsonio import dump_json, load_json
+
+
+try:  # optional JIT for the overlap resolver
+    import numba
+except ImportError:
+    numba = None
+
+
+def write_positions(pos: Dict[str, Dict[str, float]], path: str, fmt: str = "json") -> None:
+    if fmt != "bin":
+        dump_json(pos, path)
+        return
+    # Compact form: small JSON header with ids + float32 (N, 2) xy array in a .bin sidecar
+    ids = list(pos)
+    xy = np.fromiter(
+        (v for nid in ids for v in (pos[nid]["x"], pos[nid]["y"])),
+        dtype=np.float32,
+        count=2 * len(ids),
+    ).reshape(-1, 2)
+    bin_path = os.path.splitext(path)[0] + ".bin"
+    with open(bin_path, "wb") as f:
+        f.write(xy.tobytes())
+    dump_json({"ids": ids, "xy": os.path.basename(bin_path), "xy_shape": list(xy.shape), "dtype": "float32"}, path)
 
 
 def collect_courses_from_ast(ast: Dict[str, Any]) -> List[str]:
     out: List[str] = []
-    def walk(node: Any) -> None:
+    stack: List[Any] = [ast]
+    while stack:
+        node = stack.pop()
         if not isinstance(node, dict):
-            return
-        op = node.get("op")
-        if op == "COURSE" and node.get("course"):
+            continue
+        if node.get("op") == "COURSE" and node.get("course"):
             out.append(node["course"])
-        for child in node.get("items", []) or []:
-            walk(child)
-    walk(ast)
+        # push children reversed so they are visited in document order
+        stack.extend(reversed(node.get("items") or ()))
     # Unique order-preserving
-    seen = set()
-    uniq: List[str] = []
-    for c in out:
-        if c not in seen:
-            seen.add(c)
-            uniq.append(c)
-    return uniq
+    return list(dict.fromkeys(out))
 
 
 def build_graph(courses: List[Dict[str, Any]], include_coreq: bool = True) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
@@ -35,7 +54,10 @@ def build_graph(courses: List[Dict[str, Any]], include_coreq: bool = True) -> Tu
 
     def ensure_node(course_id: str, label: str = None) -> None:
         if course_id not in nodes_map:
-            nodes_map[course_id] = {"id": course_id, "label": label or course_id, "subject": course_id.split()[0] if ' ' in course_id else None}
+            # ~100 distinct subjects across thousands of nodes: share one string object each
+            subject, sep, _ = course_id.partition(" ")
+            course_id = sys.intern(course_id)
+            nodes_map[course_id] = {"id": course_id, "label": label or course_id, "subject": sys.intern(subject) if sep else None}
 
     for c in courses:
         idx = c.get("index")
@@ -52,10 +74,164 @@ def build_graph(courses: List[Dict[str, Any]], include_coreq: bool = True) -> Tu
                 ensure_node(pre)
                 edges.append({"source": pre, "target": idx, "kind": "coreq"})
 
-    nodes = [ {"id": n["id"], "label": n["label"], "subject": n.get("subject")} for n in nodes_map.values() ]
+    nodes = list(nodes_map.values())
     return nodes, edges
 
 
+# Pairs are pushed toward a slightly padded distance: the half-overlap push only
+# approaches its target asymptotically, so aiming exactly at target_dist would leave
+# converged pairs a hair inside it forever.
+_OVERLAP_PAD = 1e-3
+
+
+def _resolve_overlap_kdtree(xy: Any, target_dist: float, step: float, max_iters: int) -> Any:
+    try:
+        from scipy.spatial import cKDTree
+    except Exception as e:
+        raise RuntimeError("SciPy is required for overlap removal") from e
+    n = len(xy)
+    push_dist = target_dist * (1.0 + _OVERLAP_PAD)
+    # Stop once only a handful of pairs still overlap or the overlapping pairs' RMS penetration is negligible
+    min_overlaps = max(1, int(0.001 * n))
+    for _ in range(max_iters):
+        pairs = cKDTree(xy).query_pairs(r=push_dist, output_type="ndarray")
+        if len(pairs) == 0:
+            break
+        v = xy[pairs[:, 1]] - xy[pairs[:, 0]]
+        dist = np.hypot(v[:, 0], v[:, 1])
+        if int(((dist < target_dist) & (dist > 1e-6)).sum()) < min_overlaps:
+            break
+        hit = (dist < push_dist) & (dist > 1e-6)
+        pairs, v, dist = pairs[hit], v[hit], dist[hit]
+        # push each pair apart by half the overlap along the separating direction
+        pen = push_dist - dist
+        push = v / dist[:, None] * (pen * 0.5)[:, None]
+        disp = np.zeros_like(xy)
+        np.add.at(disp, pairs[:, 0], -push)
+        np.add.at(disp, pairs[:, 1], push)
+        xy += disp * step
+        # RMS over the overlapping pairs only, so a few overlaps aren't diluted by N
+        if np.sqrt((pen ** 2).mean()) < 1e-3 * target_dist:
+            break
+    return xy
+
+
+if numba is not None:
+    @numba.njit(cache=True, parallel=True)
+    def _resolve_overlap_numba(xy, target_dist, step, max_iters):
+        # Uniform grid in CSR form (cell_start/cell_nodes); each node gathers its own
+        # displacement from the 3x3 neighbouring cells, so threads never write shared slots.
+        n = xy.shape[0]
+        disp = np.zeros_like(xy)
+        cx = np.empty(n, dtype=np.int64)
+        cy = np.empty(n, dtype=np.int64)
+        cell_nodes = np.empty(n, dtype=np.int64)
+        push_dist = target_dist * (1.0 + _OVERLAP_PAD)
+        min_overlaps = max(1, int(0.001 * n))
+        for _ in range(max_iters):
+            min_x = xy[:, 0].min()
+            min_y = xy[:, 1].min()
+            span = max(xy[:, 0].max() - min_x, xy[:, 1].max() - min_y)
+            # cells must be at least push_dist wide; cap the grid at 2048x2048
+            cell = max(push_dist, span / 2048.0)
+            ncx = int((xy[:, 0].max() - min_x) / cell) + 1
+            ncy = int((xy[:, 1].max() - min_y) / cell) + 1
+            cell_start = np.zeros(ncx * ncy + 1, dtype=np.int64)
+            for i in range(n):
+                cx[i] = int((xy[i, 0] - min_x) / cell)
+                cy[i] = int((xy[i, 1] - min_y) / cell)
+                cell_start[cy[i] * ncx + cx[i] + 1] += 1
+            cell_start = np.cumsum(cell_start)
+            fill = cell_start[:-1].copy()
+            for i in range(n):
+                c = cy[i] * ncx + cx[i]
+                cell_nodes[fill[c]] = i
+                fill[c] += 1
+
+            overlaps = 0
+            hits = 0
+            sq = 0.0
+            for i in numba.prange(n):
+                dx = 0.0
+                dy = 0.0
+                local_overlaps = 0
+                local_hits = 0
+                local_sq = 0.0
+                for gy in range(max(cy[i] - 1, 0), min(cy[i] + 2, ncy)):
+                    for gx in range(max(cx[i] - 1, 0), min(cx[i] + 2, ncx)):
+                        c = gy * ncx + gx
+                        for k in range(cell_start[c], cell_start[c + 1]):
+                            j = cell_nodes[k]
+                            if j == i:
+                                continue
+                            vx = xy[j, 0] - xy[i, 0]
+                            vy = xy[j, 1] - xy[i, 1]
+                            dist = np.sqrt(vx * vx + vy * vy)
+                            if dist < push_dist and dist > 1e-6:
+                                pen = push_dist - dist
+                                f = pen * 0.5 / dist
+                                dx -= vx * f
+                                dy -= vy * f
+                                local_hits += 1
+                                local_sq += pen * pen
+                                if dist < target_dist:
+                                    local_overlaps += 1
+                disp[i, 0] = dx
+                disp[i, 1] = dy
+                overlaps += local_overlaps
+                hits += local_hits
+                sq += local_sq
+            # each overlapping pair is seen from both ends
+            if overlaps // 2 < min_overlaps:
+                break
+            for i in numba.prange(n):
+                xy[i, 0] += disp[i, 0] * step
+                xy[i, 1] += disp[i, 1] * step
+            # RMS over the overlapping pairs only, so a few overlaps aren't diluted by N
+            if np.sqrt(sq / hits) < 1e-3 * target_dist:
+                break
+        return xy
+
+
+def _build_nx(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> nx.Graph:
+    # Use a force-directed layout over an undirected graph for a compact web-like layout
+    G = nx.Graph()
+    G.add_nodes_from(n["id"] for n in nodes)
+    G.add_edges_from((e["source"], e["target"]) for e in edges)  # undirected for layout
+    return G
+
+
+def _apsp(graph: nx.Graph) -> Tuple[List[str], Any]:
+    try:
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import shortest_path
+    except Exception as e:
+        raise RuntimeError("SciPy is required for smacof layout") from e
+
+    # Compute all-pairs shortest path distances (undirected) in SciPy's csgraph
+    nodes_list = list(graph.nodes())
+    n = len(nodes_list)
+    index_of = {v: i for i, v in enumerate(nodes_list)}
+    row = [index_of[u] for u, _ in graph.edges()]
+    col = [index_of[v] for _, v in graph.edges()]
+    A = csr_matrix((np.ones(len(row), dtype=np.float32), (row, col)), shape=(n, n))
+    # Search in row blocks straight into a float32 matrix so the dense float64 result
+    # never exists at full size
+    D = np.empty((n, n), dtype=np.float32)
+    block = max(1, (1 << 22) // max(n, 1))
+    maxd = 0.0
+    for lo in range(0, n, block):
+        rows = D[lo:lo + block]
+        rows[...] = shortest_path(A, method="D", directed=False, unweighted=True, indices=np.arange(lo, min(lo + block, n)))
+        maxd = max(maxd, float(np.max(rows, where=np.isfinite(rows), initial=0.0)))
+
+    # Replace unreachable (infinite) distances with max finite distance * 1.5
+    for lo in range(0, n, block):
+        rows = D[lo:lo + block]
+        np.putmask(rows, np.isinf(rows), maxd * 1.5)
+    return nodes_list, D
+
+
 def compute_positions(
     nodes: List[Dict[str, Any]],
     edges: List[Dict[str, Any]],
@@ -74,13 +250,11 @@ def compute_positions(
     min_dist_mul: float = 1.5,
     overlap_max_iters: int = 60,
     overlap_step: float = 0.5,
+    # Shared across calls for the same nodes/edges (see main)
+    graph: Optional[nx.Graph] = None,
+    apsp_cache: Optional[Dict[Tuple[str, ...], Tuple[List[str], Any]]] = None,
 ) -> Dict[str, Dict[str, float]]:
-    # Use a force-directed layout over an undirected graph for a compact web-like layout
-    G = nx.Graph()
-    for n in nodes:
-        G.add_node(n["id"]) 
-    for e in edges:
-        G.add_edge(e["source"], e["target"])  # undirected for layout
+    G = graph if graph is not None else _build_nx(nodes, edges)
 
     def layout_graph(graph: nx.Graph) -> Dict[str, Tuple[float, float]]:
         if layout == "drl":
@@ -94,16 +268,12 @@ def compute_positions(
             g.add_vertices(len(nodes_list))
             g.vs["name"] = nodes_list
             # unique edges only
-            edge_idx = set()
-            for u, v in graph.edges():
-                iu, iv = index_of[u], index_of[v]
-                if iu == iv:
-                    continue
-                a, b = (iu, iv) if iu < iv else (iv, iu)
-                if (a, b) not in edge_idx:
-                    edge_idx.add((a, b))
+            edge_idx = list(dict.fromkeys(
+                (min(index_of[u], index_of[v]), max(index_of[u], index_of[v]))
+                for u, v in graph.edges() if u != v
+            ))
             if edge_idx:
-                g.add_edges(list(edge_idx))
+                g.add_edges(edge_idx)
             # DRL (OpenOrd-style) is good for community separation
             lay = g.layout_drl()
             coords = [[float(x), float(y)] for x, y in lay]
@@ -130,11 +300,6 @@ def compute_positions(
             pos = fa.forceatlas2_networkx_layout(graph, pos=None, iterations=max(300, iterations))
             return {n: (float(xy[0]), float(xy[1])) for n, xy in pos.items()}
         if layout == "smacof":
-            try:
-                import numpy as np
-            except Exception as e:
-                raise RuntimeError("NumPy is required for smacof layout") from e
-
             nodes_list = list(graph.nodes())
             n = len(nodes_list)
             if n == 0:
@@ -142,26 +307,13 @@ def compute_positions(
             if n == 1:
                 return {nodes_list[0]: (0.0, 0.0)}
 
-            # Compute all-pairs shortest path distances (undirected)
-            index_of = {v: i for i, v in enumerate(nodes_list)}
-            D = np.full((n, n), 0.0, dtype=np.float32)
-            large = 1e6
-            for i in range(n):
-                for j in range(n):
-                    if i != j:
-                        D[i, j] = large
-            for src, lengths in nx.all_pairs_shortest_path_length(graph):
-                i = index_of[src]
-                for dst, d in lengths.items():
-                    j = index_of[dst]
-                    if i != j:
-                        D[i, j] = float(d)
-                        D[j, i] = float(d)
-
-            # Replace remaining large distances with max finite distance * 1.5
-            finite = D[D < large]
-            maxd = float(finite.max()) if finite.size else 1.0
-            D[D >= large] = maxd * 1.5
+            key = tuple(nodes_list)
+            if apsp_cache is not None and key in apsp_cache:
+                nodes_list, D = apsp_cache[key]
+            else:
+                nodes_list, D = _apsp(graph)
+                if apsp_cache is not None:
+                    apsp_cache[key] = (nodes_list, D)
 
             backend_used = None
             coords = None
@@ -215,66 +367,29 @@ def compute_positions(
         pos_raw = layout_graph(G)
 
     # Normalize positions to a fixed range for consistent initial viewport
-    xs = [p[0] for p in pos_raw.values()]
-    ys = [p[1] for p in pos_raw.values()]
-    min_x, max_x = (min(xs), max(xs)) if xs else (0.0, 1.0)
-    min_y, max_y = (min(ys), max(ys)) if ys else (0.0, 1.0)
-    span_x = max(max_x - min_x, 1e-6)
-    span_y = max(max_y - min_y, 1e-6)
-
-    # Scale to a large square canvas by default; for SMACOF earlier we used disk mapping.
-    # Here keep linear scaling to preserve community geometry (good for ForceAtlas2/SMACOF alike).
-    scale = 6000.0
+    ids = list(pos_raw)
     out: Dict[str, Dict[str, float]] = {}
-    for node_id, (x, y) in pos_raw.items():
-        x01 = (x - min_x) / span_x  # 0..1
-        y01 = (y - min_y) / span_y  # 0..1
-        out[node_id] = {"x": (x01 - 0.5) * scale, "y": (y01 - 0.5) * scale}
+    if ids:
+        P = np.array([pos_raw[k] for k in ids], dtype=np.float64).reshape(-1, 2)
+        mins = P.min(axis=0)
+        spans = np.maximum(P.max(axis=0) - mins, 1e-6)
+        # Scale to a large square canvas by default; for SMACOF earlier we used disk mapping.
+        # Here keep linear scaling to preserve community geometry (good for ForceAtlas2/SMACOF alike).
+        scale = 6000.0
+        Pn = ((P - mins) / spans - 0.5) * scale
+        out = {ids[i]: {"x": float(Pn[i, 0]), "y": float(Pn[i, 1])} for i in range(len(ids))}
 
     if resolve_overlap and out:
-        # Simple grid-based overlap removal with minimal displacement
         target_dist = max(1.0, node_size_px * min_dist_mul)
-        cell = target_dist
         node_ids = list(out.keys())
-        for _ in range(overlap_max_iters):
-            # Build spatial hash
-            grid: Dict[Tuple[int,int], List[str]] = {}
-            for nid in node_ids:
-                p = out[nid]
-                gx = int(math.floor(p["x"] / cell))
-                gy = int(math.floor(p["y"] / cell))
-                grid.setdefault((gx, gy), []).append(nid)
-
-            moved = 0.0
-            disp: Dict[str, Tuple[float,float]] = {}
-            for nid in node_ids:
-                px = out[nid]["x"]; py = out[nid]["y"]
-                gx = int(math.floor(px / cell)); gy = int(math.floor(py / cell))
-                # check neighbors cells
-                for dx in (-1,0,1):
-                    for dy in (-1,0,1):
-                        cell_nodes = grid.get((gx+dx, gy+dy), [])
-                        for mid in cell_nodes:
-                            if mid <= nid:  # avoid double count and self
-                                continue
-                            qx = out[mid]["x"]; qy = out[mid]["y"]
-                            vx = qx - px; vy = qy - py
-                            dist = math.hypot(vx, vy)
-                            if dist < target_dist and dist > 1e-6:
-                                overlap = target_dist - dist
-                                ux = vx / dist; uy = vy / dist
-                                mx = -ux * (overlap * 0.5)
-                                my = -uy * (overlap * 0.5)
-                                disp[nid] = (disp.get(nid, (0.0,0.0))[0] + mx, disp.get(nid, (0.0,0.0))[1] + my)
-                                disp[mid] = (disp.get(mid, (0.0,0.0))[0] - mx, disp.get(mid, (0.0,0.0))[1] - my)
-            if not disp:
-                break
-            for nid, (dx, dy) in disp.items():
-                out[nid]["x"] += dx * overlap_step
-                out[nid]["y"] += dy * overlap_step
-                moved += abs(dx) + abs(dy)
-            if moved < 1e-3:
-                break
+        xy = np.array([[out[nid]["x"], out[nid]["y"]] for nid in node_ids], dtype=np.float64)
+        if numba is not None:
+            xy = _resolve_overlap_numba(xy, float(target_dist), float(overlap_step), int(overlap_max_iters))
+        else:
+            xy = _resolve_overlap_kdtree(xy, target_dist, overlap_step, overlap_max_iters)
+        for i, nid in enumerate(node_ids):
+            out[nid]["x"] = float(xy[i, 0])
+            out[nid]["y"] = float(xy[i, 1])
     return out
 
 
@@ -284,6 +399,7 @@ def main() -> int:
     ap.add_argument("--graph-out", default="data/graph.json", help="Output graph JSON (nodes, edges)")
     ap.add_argument("--pos-out", default="data/positions.json", help="Output positions JSON (node -> {x,y})")
     ap.add_argument("--pos-out-alt", nargs='*', default=[], help="Additional positions to generate in the form layout:name (e.g., kk:positions_kk.json spring:positions_spring.json)")
+    ap.add_argument("--pos-format", choices=["json","bin"], default="json", help="Positions format: json (node -> {x,y}) or bin (ids header + float32 .bin sidecar)")
     ap.add_argument("--hard-only", action="store_true", help="Only include hard prerequisite edges (exclude coreq)")
     ap.add_argument("--layout", choices=["spring","kk","random","none","smacof","fa2","drl"], default="fa2", help="Layout algorithm for positions")
     ap.add_argument("--iterations", type=int, default=60, help="Iterations for spring layout (lower is faster)")
@@ -299,16 +415,17 @@ def main() -> int:
     ap.add_argument("--mds-verbose", type=int, default=1, help="Verbosity for SMACOF (>=1 prints per-iteration stress)")
     args = ap.parse_args()
 
-    with open(args.input, "r", encoding="utf-8") as f:
-        courses = json.load(f)
+    courses = load_json(args.input)
 
     nodes, edges = build_graph(courses, include_coreq=not args.hard_only)
 
     os.makedirs(os.path.dirname(args.graph_out) or ".", exist_ok=True)
-    with open(args.graph_out, "w", encoding="utf-8") as f:
-        json.dump({"nodes": nodes, "edges": edges}, f, ensure_ascii=False, indent=2)
+    dump_json({"nodes": nodes, "edges": edges}, args.graph_out)
 
     print(f"building positions: nodes={len(nodes)} edges={len(edges)} layout={args.layout} iter={args.iterations} component_wise={args.component_wise}")
+    # Build the layout graph (and smacof distance matrices) once for all layouts
+    G = _build_nx(nodes, edges)
+    apsp_cache: Dict[Tuple[str, ...], Tuple[List[str], Any]] = {}
     pos = compute_positions(
         nodes, edges,
         layout=args.layout,
@@ -321,9 +438,10 @@ def main() -> int:
         resolve_overlap=args.resolve_overlap,
         node_size_px=args.node_size,
         min_dist_mul=args.min_dist_mul,
+        graph=G,
+        apsp_cache=apsp_cache,
     )
-    with open(args.pos_out, "w", encoding="utf-8") as f:
-        json.dump(pos, f, ensure_ascii=False, indent=2)
+    write_positions(pos, args.pos_out, args.pos_format)
 
     # Optionally generate additional layouts
     for spec in args.pos_out_alt:
@@ -342,9 +460,10 @@ def main() -> int:
                 mds_max_iter=args.mds_max_iter,
                 mds_eps=args.mds_eps,
                 mds_verbose=args.mds_verbose,
+                graph=G,
+                apsp_cache=apsp_cache,
             )
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(alt, f, ensure_ascii=False, indent=2)
+            write_positions(alt, path, args.pos_format)
             print(f"wrote alt positions: {lay} -> {path}")
         except Exception as e:
             print(f"[warn] failed alt positions {lay}: {e}")
@@ -1,19 +1,37 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import concurrent.futures
-import json
+import hashlib
+import io
+import os
 import re
+import sqlite3
 import sys
+import threading
 import time
 from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
-from xml.etree import ElementTree as ET
+from lxml import etree as ET
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from jsonio import dumps, dumps_jsonl, iter_jsonl
 
 
 BASE_URL = "https://courses.illinois.edu/cisapp/explorer/catalog"
 
+# Prerequisite tags are tried in this order
+_PREREQ_TAGS = ("prerequisites", "prerequisite", "Prerequisites", "Prerequisite")
+# The only elements a course document is scanned for
+_COURSE_TAGS = ("label", "title", "description", "courseSectionInformation") + _PREREQ_TAGS
+_PREREQ_TEXT_RE = re.compile(r"Prerequisite[s]?:\s*(.*)$", re.IGNORECASE | re.DOTALL)
+
+# lxml parsers are not thread-safe; keep one per worker thread
+_parser_local = threading.local()
+
 
 @dataclass
 class CourseRecord:
@@ -23,62 +41,151 @@ class CourseRecord:
     prerequisites: Optional[str]
 
 
-def parse_xml(content: bytes) -> ET.Element:
+def record_sort_key(record: CourseRecord) -> Tuple[str, int, str]:
+    # (subject, numeric part of the number or -1, raw number), split once per record
+    subject, _, number = record.index.partition(" ")
+    digits = "".join(ch for ch in number if ch.isdigit())
+    return (subject, int(digits) if digits else -1, number)
+
+
+def _get_parser() -> ET.XMLParser:
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = ET.XMLParser(huge_tree=False, remove_blank_text=True, collect_ids=False)
+        _parser_local.parser = parser
+    return parser
+
+
+def parse_xml(content: bytes) -> ET._Element:
     try:
-        return ET.fromstring(content)
+        return ET.fromstring(content, _get_parser())
     except ET.ParseError as exc:
         raise RuntimeError(f"Failed to parse XML: {exc}")
 
 
+class HttpCache:
+    # URL -> (ETag, Last-Modified, body file) in SQLite; bodies are content-addressed files
+    def __init__(self, db_path: str) -> None:
+        self.body_dir = os.path.splitext(db_path)[0]
+        os.makedirs(self.body_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_path TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _row(self, url: str) -> Optional[Tuple[Optional[str], Optional[str], str]]:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, body_path FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        row = self._row(url)
+        if row is None or not os.path.exists(row[2]):
+            return {}
+        etag, last_modified, _ = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def load(self, url: str) -> bytes:
+        row = self._row(url)
+        if row is None:
+            raise RuntimeError(f"304 for {url} without a cached body")
+        with open(row[2], "rb") as f:
+            return f.read()
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes) -> None:
+        if not etag and not last_modified:
+            return
+        body_path = os.path.join(self.body_dir, hashlib.sha256(body).hexdigest())
+        if not os.path.exists(body_path):
+            tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body_path) VALUES (?, ?, ?, ?)",
+                (url, etag, last_modified, body_path),
+            )
+
+
+# Set by main() unless --no-http-cache is given
+_http_cache: Optional[HttpCache] = None
+
+# GET prepared once from the session's headers by main(); cloned per request
+_get_template: Optional[requests.PreparedRequest] = None
+
+
+def fast_get(session: requests.Session, url: str, timeout: float, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    # session.get re-merges session headers, cookies and environment settings on every call
+    if _get_template is None:
+        return session.get(url, timeout=timeout, headers=headers)
+    prepped = _get_template.copy()
+    prepped.prepare_url(url, None)
+    if headers:
+        prepped.headers.update(headers)
+    return session.send(prepped, timeout=timeout)
+
+
 def fetch(session: requests.Session, url: str) -> bytes:
-    resp = session.get(url, timeout=30)
+    headers = _http_cache.conditional_headers(url) if _http_cache else {}
+    resp = fast_get(session, url, 30, headers)
+    if resp.status_code == 304 and _http_cache:
+        return _http_cache.load(url)
     if resp.status_code != 200:
         raise RuntimeError(f"GET {url} -> {resp.status_code}")
+    if _http_cache:
+        _http_cache.store(url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), resp.content)
     return resp.content
 
 
-def get_subject_ids(session: requests.Session, year: str, term: str) -> List[str]:
-    url = f"{BASE_URL}/{year}/{term}.xml"
-    root = parse_xml(fetch(session, url))
-    subjects = []
-    for node in root.findall(".//subject"):
+def ids_from_xml(content: bytes, tag: str) -> List[str]:
+    root = parse_xml(content)
+    ids = []
+    for node in root.findall(f".//{tag}"):
         node_id = node.attrib.get("id")
         if node_id:
-            subjects.append(node_id)
-    return subjects
+            ids.append(node_id)
+    return ids
+
+
+def get_subject_ids(session: requests.Session, year: str, term: str) -> List[str]:
+    url = f"{BASE_URL}/{year}/{term}.xml"
+    return ids_from_xml(fetch(session, url), "subject")
 
 
 def get_course_numbers_for_subject(session: requests.Session, year: str, term: str, subject: str) -> List[str]:
     url = f"{BASE_URL}/{year}/{term}/{subject}.xml"
-    root = parse_xml(fetch(session, url))
-    courses = []
-    for node in root.findall(".//course"):
-        node_id = node.attrib.get("id")
-        if node_id:
-            courses.append(node_id)
-    return courses
+    return ids_from_xml(fetch(session, url), "course")
 
 
-def extract_prerequisite_text(root: ET.Element) -> Optional[str]:
+def extract_prerequisite_text(first_text: Dict[str, Optional[str]]) -> Optional[str]:
     # Prefer explicitly labeled prerequisite elements if present
-    for tag in ["prerequisites", "prerequisite", "Prerequisites", "Prerequisite"]:
-        found = root.find(f".//{tag}")
-        if found is not None and (found.text and found.text.strip()):
-            return found.text.strip()
+    for tag in _PREREQ_TAGS:
+        text = first_text.get(tag)
+        if text and text.strip():
+            return text.strip()
 
     # Fallback: courseSectionInformation often contains "Prerequisite:" free text
-    csi = root.find(".//courseSectionInformation")
-    if csi is not None and csi.text:
-        text = csi.text.strip()
-        match = re.search(r"Prerequisite[s]?:\s*(.*)$", text, flags=re.IGNORECASE | re.DOTALL)
+    csi = first_text.get("courseSectionInformation")
+    if csi:
+        match = _PREREQ_TEXT_RE.search(csi.strip())
         if match:
             return match.group(1).strip()
 
     # As a last resort, scan description for a Prerequisite sentence
-    desc = root.find(".//description")
-    if desc is not None and desc.text:
-        text = desc.text.strip()
-        match = re.search(r"Prerequisite[s]?:\s*(.*)$", text, flags=re.IGNORECASE | re.DOTALL)
+    desc = first_text.get("description")
+    if desc:
+        match = _PREREQ_TEXT_RE.search(desc.strip())
         if match:
             return match.group(1).strip()
 
@@ -87,24 +194,52 @@ def extract_prerequisite_text(root: ET.Element) -> Optional[str]:
 
 def get_course_details(session: requests.Session, year: str, term: str, subject: str, course_number: str) -> CourseRecord:
     url = f"{BASE_URL}/{year}/{term}/{subject}/{course_number}.xml"
-    root = parse_xml(fetch(session, url))
+    return course_record_from_xml(fetch(session, url), subject, course_number)
+
+
+def scan_course_xml(content: bytes) -> Dict[str, Optional[str]]:
+    # Stream the document and keep only the text of the first element of each wanted tag;
+    # matched elements and their preceding siblings are dropped as we go.
+    first_text: Dict[str, Optional[str]] = {}
+    context = ET.iterparse(
+        io.BytesIO(content), events=("end",), tag=_COURSE_TAGS,
+        remove_blank_text=True, collect_ids=False, huge_tree=False,
+    )
+    try:
+        for _, elem in context:
+            if elem.tag in _COURSE_TAGS and elem.tag not in first_text:
+                first_text[elem.tag] = elem.text
+            elem.clear(keep_tail=False)
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+            # name, description and the preferred prerequisite tag settle every field
+            if first_text.get("label") and "description" in first_text and (first_text.get("prerequisites") or "").strip():
+                break
+    except ET.ParseError as exc:
+        raise RuntimeError(f"Failed to parse XML: {exc}")
+    return first_text
+
+
+def course_record_from_xml(content: bytes, subject: str, course_number: str) -> CourseRecord:
+    first_text = scan_course_xml(content)
 
     # Title/name may be in <label> or <title>
     name = None
-    label_node = root.find(".//label")
-    if label_node is not None and label_node.text:
-        name = label_node.text.strip()
-    else:
-        title_node = root.find(".//title")
-        if title_node is not None and title_node.text:
-            name = title_node.text.strip()
+    label = first_text.get("label")
+    title = first_text.get("title")
+    if label:
+        name = label.strip()
+    elif title:
+        name = title.strip()
 
     description = None
-    desc_node = root.find(".//description")
-    if desc_node is not None and desc_node.text:
-        description = desc_node.text.strip()
+    desc = first_text.get("description")
+    if desc:
+        description = desc.strip()
 
-    prerequisites_text = extract_prerequisite_text(root)
+    prerequisites_text = extract_prerequisite_text(first_text)
 
     return CourseRecord(
         index=f"{subject} {course_number}",
@@ -114,9 +249,100 @@ def get_course_details(session: requests.Session, year: str, term: str, subject:
     )
 
 
+async def fetch_async(session: "aiohttp.ClientSession", url: str) -> bytes:
+    headers = _http_cache.conditional_headers(url) if _http_cache else {}
+    async with session.get(url, headers=headers) as resp:
+        if resp.status == 304 and _http_cache:
+            return _http_cache.load(url)
+        if resp.status != 200:
+            raise RuntimeError(f"GET {url} -> {resp.status}")
+        body = await resp.read()
+        if _http_cache:
+            _http_cache.store(url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), body)
+        return body
+
+
+async def fetch_all_async(subject_ids: List[str], year: str, term: str, concurrency: int, sleep: float, headers: Dict[str, str], sink: "JsonlSink") -> None:
+    # One event loop, many in-flight GETs: the semaphore bounds concurrency instead of a thread count
+    import aiohttp
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def bounded_fetch(session: aiohttp.ClientSession, url: str) -> bytes:
+        async with sem:
+            if sleep:
+                await asyncio.sleep(sleep)
+            return await fetch_async(session, url)
+
+    async def process_subject(session: aiohttp.ClientSession, subject_id: str) -> None:
+        try:
+            content = await bounded_fetch(session, f"{BASE_URL}/{year}/{term}/{subject_id}.xml")
+            course_numbers = ids_from_xml(content, "course")
+        except Exception as exc_subj:
+            print(f"[warn] Failed to list courses for {subject_id}: {exc_subj}")
+            return
+
+        async def one(course_number: str) -> Optional[CourseRecord]:
+            try:
+                content = await bounded_fetch(session, f"{BASE_URL}/{year}/{term}/{subject_id}/{course_number}.xml")
+                return course_record_from_xml(content, subject_id, course_number)
+            except Exception as exc_course:
+                print(f"[warn] Failed details for {subject_id} {course_number}: {exc_course}")
+                return None
+
+        results = await asyncio.gather(*(one(c) for c in course_numbers))
+        subject_records = [r for r in results if r is not None]
+        sink.write(subject_records)
+        print(f"[info] {subject_id}: {len(subject_records)} course(s)")
+
+    connector = aiohttp.TCPConnector(limit=concurrency * 2, limit_per_host=concurrency, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        await asyncio.gather(*(process_subject(session, sid) for sid in subject_ids))
+
+
+class JsonlSink:
+    # Appends each subject's records as JSON lines as soon as they arrive, so the
+    # fetch never holds the whole catalog in memory
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.count = 0
+        self.lock = threading.Lock()
+        self.f = open(path, "wb")
+
+    def write(self, records: List[CourseRecord]) -> None:
+        data = dumps_jsonl(asdict(r) for r in records)
+        with self.lock:
+            self.f.write(data)
+            self.count += len(records)
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def read_records_jsonl(path: str) -> List[CourseRecord]:
+    return [CourseRecord(**obj) for obj in iter_jsonl(path)]
+
+
+def write_records_json(records: List[CourseRecord], path: str) -> None:
+    # Same bytes as json.dump([...], indent=2), but one record dict is alive at a time
+    with open(path, "wb") as f:
+        if not records:
+            f.write(b"[]")
+            return
+        f.write(b"[\n")
+        for i, r in enumerate(records):
+            if i:
+                f.write(b",\n")
+            # Re-indent only structural newlines: JSON escapes "\n" inside strings, while
+            # textwrap/splitlines would also break on raw U+2028/U+2029/U+0085 in values
+            f.write(b"  " + dumps(asdict(r), indent=True).replace(b"\n", b"\n  "))
+        f.write(b"\n]")
+
+
 def try_year_term(session: requests.Session, year: str, term: str) -> bool:
     url = f"{BASE_URL}/{year}/{term}.xml"
-    resp = session.get(url, timeout=15)
+    resp = fast_get(session, url, 15)
     return resp.status_code == 200
 
 
@@ -147,10 +373,30 @@ def main() -> int:
     parser.add_argument("--max-workers", type=int, default=12, help="Max concurrent requests")
     parser.add_argument("--output", default="data/courses.json", help="Output JSON path")
     parser.add_argument("--sleep", type=float, default=0.0, help="Optional per-request sleep seconds")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Fetch with asyncio + aiohttp instead of a thread pool")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max in-flight requests with --async")
+    parser.add_argument("--http-cache", default="data/.http_cache.sqlite", help="SQLite file for ETag/Last-Modified conditional GETs")
+    parser.add_argument("--no-http-cache", action="store_true", help="Always download every XML document")
     args = parser.parse_args()
 
+    global _http_cache, _get_template
+    if not args.no_http_cache:
+        os.makedirs(os.path.dirname(args.http_cache) or ".", exist_ok=True)
+        _http_cache = HttpCache(args.http_cache)
+
     session = requests.Session()
-    session.headers.update({"Accept": "application/xml, text/xml;q=0.9, */*;q=0.8", "User-Agent": "uiuc-course-scraper/1.0"})
+    session.headers.update({"Accept": "application/xml, text/xml;q=0.9, */*;q=0.8", "User-Agent": "uiuc-course-scraper/1.0", "Connection": "keep-alive"})
+    # Size the keep-alive pool to the worker count so threads don't churn connections
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=args.max_workers, pool_maxsize=args.max_workers * 2, max_retries=retry)
+    session.mount("https://", adapter)
+    _get_template = session.prepare_request(requests.Request("GET", BASE_URL))
 
     year = args.year
     term = args.term
@@ -168,7 +414,17 @@ def main() -> int:
 
     print(f"[info] Found {len(subject_ids)} subject(s)")
 
-    all_course_records: List[CourseRecord] = []
+    output_path = args.output
+    output_dir = output_path.rsplit("/", 1)[0] if "/" in output_path else "."
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+    except Exception:
+        pass
+
+    # Records stream to JSON lines; a .json output is rewritten from them as a sorted array
+    write_array = not output_path.endswith(".jsonl")
+    jsonl_path = os.path.splitext(output_path)[0] + ".jsonl" if write_array else output_path
+    sink = JsonlSink(jsonl_path)
 
     def process_subject(subject_id: str) -> List[CourseRecord]:
         try:
@@ -191,36 +447,40 @@ def main() -> int:
                 continue
         return subject_records
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_workers) as executor:
-        future_to_subject: Dict[concurrent.futures.Future, str] = {}
-        for subject_id in subject_ids:
-            future = executor.submit(process_subject, subject_id)
-            future_to_subject[future] = subject_id
-        for future in concurrent.futures.as_completed(future_to_subject):
-            subject_id = future_to_subject[future]
-            try:
-                subject_records = future.result()
-                all_course_records.extend(subject_records)
-                print(f"[info] {subject_id}: {len(subject_records)} course(s)")
-            except Exception as exc:
-                print(f"[warn] Subject {subject_id} failed: {exc}")
-
-    # Sort deterministically
-    all_course_records.sort(key=lambda r: (r.index.split()[0], int(re.sub(r"[^0-9]", "", r.index.split()[1])) if len(r.index.split()) > 1 and re.search(r"\d", r.index.split()[1]) else r.index))
-
-    # Serialize to JSON array of objects
-    output_path = args.output
-    output_dir = output_path.rsplit("/", 1)[0] if "/" in output_path else "."
     try:
-        import os
-        os.makedirs(output_dir, exist_ok=True)
-    except Exception:
-        pass
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump([asdict(r) for r in all_course_records], f, ensure_ascii=False, indent=2)
-
-    print(f"[done] Wrote {len(all_course_records)} courses -> {output_path}")
+        if args.use_async:
+            try:
+                asyncio.run(fetch_all_async(subject_ids, year, term, args.concurrency, args.sleep, dict(session.headers), sink))
+            except ImportError:
+                print("[error] --async requires aiohttp; pip install aiohttp")
+                sink.close()
+                os.remove(jsonl_path)
+                return 1
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+                future_to_subject: Dict[concurrent.futures.Future, str] = {}
+                for subject_id in subject_ids:
+                    future = executor.submit(process_subject, subject_id)
+                    future_to_subject[future] = subject_id
+                for future in concurrent.futures.as_completed(future_to_subject):
+                    subject_id = future_to_subject[future]
+                    try:
+                        subject_records = future.result()
+                        sink.write(subject_records)
+                        print(f"[info] {subject_id}: {len(subject_records)} course(s)")
+                    except Exception as exc:
+                        print(f"[warn] Subject {subject_id} failed: {exc}")
+    finally:
+        sink.close()
+
+    if write_array:
+        # Sort deterministically and serialize to a JSON array of objects
+        all_course_records = read_records_jsonl(jsonl_path)
+        all_course_records.sort(key=record_sort_key)
+        write_records_json(all_course_records, output_path)
+        os.remove(jsonl_path)
+
+    print(f"[done] Wrote {sink.count} courses -> {output_path}")
     return 0
 
 
@@ -0,0 +1,50 @@
+import json
+from typing import Any, Iterable, Iterator
+
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+
+def _to_builtin(obj: Any) -> Any:
+    # NumPy scalars/arrays for the stdlib fallback (orjson handles them natively)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, default=_to_builtin).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_jsonl(objs: Iterable[Any]) -> bytes:
+    # One compact JSON document per line; JSON escapes "\n" inside strings
+    return b"".join(dumps(obj) + b"\n" for obj in objs)
+
+
+def iter_jsonl(path: str) -> Iterator[Any]:
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def load_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_json(obj: Any, path: str) -> None:
+    with open(path, "wb") as f:
+        f.write(dumps(obj, indent=True))
@@ -1,26 +1,45 @@
 #!/usr/bin/env python3
 import argparse
-import json
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
+from jsonio import dump_json, load_json
+
 
 COURSE_RE = re.compile(r"\b([A-Z]{2,4})\s*(\d{2,3}[A-Z]?)\b")
 
 # Clause boundaries: semicolons are strong AND separators at UIUC
 CLAUSE_SPLIT_RE = re.compile(r";+")
 
+_WS_RE = re.compile(r"\s+")
+_AND_RE = re.compile(r"\band\b")
+_OR_RE = re.compile(r"\bor\b")
+_ONE_OF_RE = re.compile(r"\b(one of|any of)\b", re.IGNORECASE)
+# Every co-requisite marker in one scan ("credit or concurrent enrollment in" is covered by "concurrent")
+_COREQ_RE = re.compile(r"concurrent|co-?requisite")
+
 
 def find_course_spans(text: str) -> List[Tuple[str, int, int]]:
     spans: List[Tuple[str, int, int]] = []
     for m in COURSE_RE.finditer(text):
-        course = f"{m.group(1)} {m.group(2)}"
+        # Interned so repeated course tokens share one string across ASTs
+        course = sys.intern(f"{m.group(1)} {m.group(2)}")
         spans.append((course, m.start(), m.end()))
     return spans
 
 
 def normalize_space(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip()
+    return _WS_RE.sub(" ", s).strip()
+
+
+def _classify(s: str) -> Tuple[bool, bool, bool, bool]:
+    # (has "and/or", has "and", has "or", has comma) for one connector/segment string
+    s = s.lower()
+    return ("and/or" in s, _AND_RE.search(s) is not None, _OR_RE.search(s) is not None, "," in s)
 
 
 def parse_clause_into_group(clause: str) -> Dict[str, Any]:
@@ -30,7 +49,7 @@ def parse_clause_into_group(clause: str) -> Dict[str, Any]:
         return {"op": "EMPTY"}
 
     # Detect "one of" window: treat everything until boundary as OR
-    one_of_match = re.search(r"\b(one of|any of)\b", clause_clean, flags=re.IGNORECASE)
+    one_of_match = _ONE_OF_RE.search(clause_clean)
     if one_of_match:
         # Take all courses in the clause as OR if they appear after the phrase
         start_idx = one_of_match.end()
@@ -50,16 +69,16 @@ def parse_clause_into_group(clause: str) -> Dict[str, Any]:
     for i in range(len(courses) - 1):
         _, _, end_prev = courses[i]
         _, start_next, _ = courses[i + 1]
-        between = clause_clean[end_prev:start_next].lower()
-        if "and/or" in between:
+        has_andor, has_and, has_or, has_comma = _classify(clause_clean[end_prev:start_next])
+        if has_andor:
             connectors.append("OR")
-        elif re.search(r"\band\b", between):
+        elif has_and:
             connectors.append("AND")
-        elif re.search(r"\bor\b", between):
+        elif has_or:
             connectors.append("OR")
         else:
             # Default: comma-only separation; lean towards OR if followed by or earlier in span
-            if "," in between:
+            if has_comma:
                 connectors.append("LIST")
             else:
                 connectors.append("UNKNOWN")
@@ -78,20 +97,26 @@ def parse_clause_into_group(clause: str) -> Dict[str, Any]:
         return {"op": "AND", "items": course_items} if len(course_items) > 1 else course_items[0]
 
     # Mixed AND and OR: build small AST by splitting on commas and respecting local conjunctions
-    # Simple heuristic: split clause by commas, parse each segment for explicit AND/OR
-    segments = [normalize_space(s) for s in re.split(r",+", clause_clean) if normalize_space(s)]
+    # Simple heuristic: split clause by commas, parse each segment for explicit AND/OR.
+    # Course spans are already sorted by offset, so bucket them per segment in one walk.
+    seg_ends = [i for i, ch in enumerate(clause_clean) if ch == ","]
+    seg_ends.append(len(clause_clean))
     subitems: List[Dict[str, Any]] = []
-    for seg in segments:
-        seg_courses = find_course_spans(seg)
-        if not seg_courses:
-            continue
-        if re.search(r"\band\b", seg.lower()) and not re.search(r"\bor\b", seg.lower()):
-            subitems.append({"op": "AND", "items": [{"op": "COURSE", "course": c} for (c, _, _) in seg_courses]})
-        elif re.search(r"\bor\b", seg.lower()) and not re.search(r"\band\b", seg.lower()):
-            subitems.append({"op": "OR", "items": [{"op": "COURSE", "course": c} for (c, _, _) in seg_courses]})
-        else:
-            # ambiguous within segment; default to OR
-            subitems.append({"op": "OR", "items": [{"op": "COURSE", "course": c} for (c, _, _) in seg_courses]})
+    seg_start = 0
+    k = 0
+    for seg_end in seg_ends:
+        seg_courses: List[str] = []
+        while k < len(courses) and courses[k][1] < seg_end:
+            seg_courses.append(courses[k][0])
+            k += 1
+        if seg_courses:
+            _, has_and, has_or, _ = _classify(clause_clean[seg_start:seg_end])
+            if has_and and not has_or:
+                subitems.append({"op": "AND", "items": [{"op": "COURSE", "course": c} for c in seg_courses]})
+            else:
+                # explicit OR, or ambiguous within segment; default to OR
+                subitems.append({"op": "OR", "items": [{"op": "COURSE", "course": c} for c in seg_courses]})
+        seg_start = seg_end + 1
 
     if not subitems:
         subitems = [{"op": "COURSE", "course": c} for (c, _, _) in courses]
@@ -108,28 +133,23 @@ def parse_clause_into_group(clause: str) -> Dict[str, Any]:
     return {"op": "AND", "items": subitems}
 
 
+# Many courses share identical prerequisite text; the returned AST is shared
+# between callers and must not be mutated.
+@lru_cache(maxsize=None)
 def parse_prereq_text(text: str) -> Dict[str, Any]:
     # Split by semicolons into top-level AND clauses
-    clauses = [normalize_space(c) for c in CLAUSE_SPLIT_RE.split(text) if normalize_space(c)]
+    # Collapse whitespace once; splitting cannot create new runs, so clauses only need a strip
+    clauses = [c for c in (seg.strip() for seg in CLAUSE_SPLIT_RE.split(normalize_space(text))) if c]
     if not clauses:
         return {"hard": {"op": "EMPTY"}, "coreq_ok": {"op": "EMPTY"}}
 
-    def is_coreq_clause(c: str) -> bool:
-        c_low = c.lower()
-        return (
-            ("concurrent" in c_low) or
-            ("co-requisite" in c_low) or
-            ("corequisite" in c_low) or
-            re.search(r"credit\s+or\s+concurrent\s+(enrollment|registration)\s+in", c_low) is not None
-        )
-
     hard_groups: List[Dict[str, Any]] = []
     coreq_groups: List[Dict[str, Any]] = []
     for clause in clauses:
         grp = parse_clause_into_group(clause)
         if grp.get("op") == "EMPTY":
             continue
-        if is_coreq_clause(clause):
+        if _COREQ_RE.search(clause.lower()) is not None:
             coreq_groups.append(grp)
         else:
             hard_groups.append(grp)
@@ -144,40 +164,45 @@ def parse_prereq_text(text: str) -> Dict[str, Any]:
     return {"hard": fold(hard_groups), "coreq_ok": fold(coreq_groups)}
 
 
+def _parse_one(item: Dict[str, Any]) -> Dict[str, Any]:
+    raw = item.get("prerequisites") or ""
+    return {
+        "index": item.get("index"),
+        "name": item.get("name"),
+        "raw": raw,
+        "ast": parse_prereq_text(raw),
+    }
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Parse course-only prerequisite text into AND/OR groups")
     ap.add_argument("input", default="data/analysis/course_only.json", nargs="?", help="Input JSON array of course-only prereqs")
     ap.add_argument("--output", default="data/parsed/course_only_parsed.json", help="Output JSON path")
     ap.add_argument("--unparsed-output", default="data/parsed/course_only_unparsed.json", help="Unparsed/empty output JSON path")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes for parsing (1 = serial)")
     args = ap.parse_args()
 
-    with open(args.input, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_json(args.input)
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            records = list(ex.map(_parse_one, data, chunksize=256))
+    else:
+        records = [_parse_one(item) for item in data]
 
     parsed: List[Dict[str, Any]] = []
     unparsed: List[Dict[str, Any]] = []
-
-    for item in data:
-        raw = item.get("prerequisites") or ""
-        ast = parse_prereq_text(raw)
-        record = {
-            "index": item.get("index"),
-            "name": item.get("name"),
-            "raw": raw,
-            "ast": ast,
-        }
+    for record in records:
+        ast = record["ast"]
         # Consider unparsed only if both hard and coreq_ok are EMPTY
         if (isinstance(ast, dict) and ast.get("hard", {}).get("op") == "EMPTY" and ast.get("coreq_ok", {}).get("op") == "EMPTY"):
             unparsed.append(record)
         else:
             parsed.append(record)
 
-    import os
     os.makedirs("data/parsed", exist_ok=True)
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(parsed, f, ensure_ascii=False, indent=2)
-    with open(args.unparsed_output, "w", encoding="utf-8") as f:
-        json.dump(unparsed, f, ensure_ascii=False, indent=2)
+    dump_json(parsed, args.output)
+    dump_json(unparsed, args.unparsed_output)
 
     print(f"parsed: {len(parsed)}")
     print(f"unparsed: {len(unparsed)}")
@@ -0,0 +1,8 @@
+import re
+from typing import Any
+
+
+def assert_compiled(*patterns: Any) -> None:
+    # Every pattern is compiled at import; hot paths never pass raw strings to re.*
+    bad = [p for p in patterns if not isinstance(p, re.Pattern)]
+    assert not bad, f"uncompiled regex patterns: {bad!r}"
@@ -1,87 +1,168 @@
 #!/usr/bin/env python3
 import argparse
-import json
 import os
-from typing import Any, Dict, List, Set, Tuple
+import random
+from typing import Any, Dict, List, Tuple
 
 import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from jsonio import dump_json, load_json
 
 
 def load_graph(path: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_json(path)
     return data.get("nodes", []), data.get("edges", [])
 
 
-def directed_hard_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> nx.DiGraph:
-    G = nx.DiGraph()
+def directed_hard_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+    # Nodes are integer-encoded in input order; edges stay flat src/dst index arrays
+    node_data: List[Dict[str, Any]] = []
+    id2idx: Dict[str, int] = {}
+
+    def idx(v: str, data: Dict[str, Any]) -> int:
+        i = id2idx.get(v)
+        if i is None:
+            i = id2idx[v] = len(node_data)
+            node_data.append(data)
+        return i
+
     for n in nodes:
-        G.add_node(n["id"], **n)
+        node_data[idx(n["id"], n)] = n
+    pairs: Dict[Tuple[int, int], None] = {}
     for e in edges:
         if e.get("kind") == "hard":
-            G.add_edge(e["source"], e["target"])
-    # drop self-loops
-    G.remove_edges_from(nx.selfloop_edges(G))
-    return G
-
-
-def transitive_reduction_with_scc(G: nx.DiGraph) -> nx.DiGraph:
-    # Collapse strongly connected components to ensure DAG for TR
-    sccs: List[Set[str]] = list(nx.strongly_connected_components(G))
-    comp_id_of: Dict[str, int] = {}
-    for i, comp in enumerate(sccs):
-        for v in comp:
-            comp_id_of[v] = i
-
-    # Build component DAG
-    CG = nx.DiGraph()
-    for i in range(len(sccs)):
-        CG.add_node(i)
-    original_cross_edges: Dict[Tuple[int, int], List[Tuple[str, str]]] = {}
-    for u, v in G.edges():
-        cu, cv = comp_id_of[u], comp_id_of[v]
-        if cu != cv:
-            CG.add_edge(cu, cv)
-            original_cross_edges.setdefault((cu, cv), []).append((u, v))
-
-    # Transitive reduction on component DAG
-    TR_CG = nx.transitive_reduction(CG) if CG.number_of_edges() else CG
-
-    # Build reduced graph: keep all intra-SCC edges; between SCCs keep one representative per reduced edge
-    R = nx.DiGraph()
-    R.add_nodes_from(G.nodes(data=True))
-
-    # Keep intra-SCC edges (within each component)
-    for i, comp in enumerate(sccs):
-        if len(comp) == 1:
+            u, v = idx(e["source"], {"id": e["source"]}), idx(e["target"], {"id": e["target"]})
+            # drop self-loops
+            if u != v:
+                pairs[(u, v)] = None
+    src = np.fromiter((u for u, _ in pairs), dtype=np.int64, count=len(pairs))
+    dst = np.fromiter((v for _, v in pairs), dtype=np.int64, count=len(pairs))
+    # Group edges by source, keeping insertion order per source (adjacency order)
+    order = np.argsort(src, kind="stable")
+    return node_data, src[order], dst[order]
+
+
+def _transitive_reduction_mask(n: int, cu: np.ndarray, cv: np.ndarray) -> np.ndarray:
+    # Transitive reduction of a DAG given as unique edges cu -> cv; returns which edges to keep.
+    # Nodes are visited in reverse topological order holding their descendants as int bitsets.
+    # A bitset is freed once all predecessors have read it, so memory follows the frontier
+    # rather than the full transitive closure.
+    A = csr_matrix((np.arange(1, len(cu) + 1, dtype=np.int64), (cu, cv)), shape=(n, n))
+    indptr, indices, edge_pos = A.indptr.tolist(), A.indices.tolist(), (A.data - 1).tolist()
+    indeg = np.bincount(cv, minlength=n).tolist()
+
+    # Kahn's algorithm for a topological order
+    remaining = list(indeg)
+    stack = [u for u in range(n) if remaining[u] == 0]
+    topo: List[int] = []
+    while stack:
+        u = stack.pop()
+        topo.append(u)
+        for w in indices[indptr[u]:indptr[u + 1]]:
+            remaining[w] -= 1
+            if remaining[w] == 0:
+                stack.append(w)
+
+    keep = np.ones(len(cu), dtype=bool)
+    pending = list(indeg)
+    desc: Dict[int, int] = {}
+    for u in reversed(topo):
+        lo, hi = indptr[u], indptr[u + 1]
+        if lo == hi:
+            if pending[u]:
+                desc[u] = 0
             continue
-        for u in comp:
-            for v in G.successors(u):
-                if comp_id_of[v] == i:
-                    R.add_edge(u, v)
-
-    # For each edge in reduced component graph, keep one representative original edge
-    for cu, cv in TR_CG.edges():
-        reps = original_cross_edges.get((cu, cv), [])
-        if not reps:
-            continue
-        # choose deterministically: first sorted
-        u, v = sorted(reps)[0]
-        R.add_edge(u, v)
-
-    return R
-
+        # Everything reachable through some successor in one or more steps
+        via = 0
+        for w in indices[lo:hi]:
+            via |= desc[w]
+        own = 0
+        for k in range(lo, hi):
+            w = indices[k]
+            if (via >> w) & 1:
+                keep[edge_pos[k]] = False
+            own |= 1 << w
+            pending[w] -= 1
+            if not pending[w]:
+                del desc[w]
+        if pending[u]:
+            desc[u] = via | own
+    return keep
+
+
+def transitive_reduction_with_scc(names: List[str], src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(names)
+    if not len(src):
+        return src, dst
 
-def detect_communities_undirected(R: nx.DiGraph) -> Dict[str, int]:
-    UG = R.to_undirected()
-    # Greedy modularity communities (built-in, no extra deps)
-    communities = list(nx.algorithms.community.greedy_modularity_communities(UG))
+    # Collapse strongly connected components to ensure DAG for TR
+    A = csr_matrix((np.ones(len(src), dtype=np.int64), (src, dst)), shape=(n, n))
+    n_comp, labels = connected_components(A, directed=True, connection="strong")
+    # int32 labels would overflow the cs * n_comp + cd pair keys past ~46k components
+    labels = labels.astype(np.int64)
+    cs, cd = labels[src], labels[dst]
+    cross = cs != cd
+
+    if n_comp == n:
+        # Already a DAG: every edge is its own component edge, so skip the
+        # intra-SCC split and the tie-breaking sort over course names
+        in_src, in_dst = src[:0], dst[:0]
+        order = np.argsort(cs * n_comp + cd)
+        rep_src, rep_dst = src[order], dst[order]
+        cu, cv = cs[order], cd[order]
+    else:
+        # Keep intra-SCC edges (within each component)
+        in_src, in_dst = src[~cross], dst[~cross]
+        if not cross.any():
+            return in_src, in_dst
+
+        # Build component DAG; per component edge remember the first original edge in sorted order
+        name_arr = np.array(names, dtype=object)
+        xs, xd = src[cross], dst[cross]
+        keys = cs[cross] * n_comp + cd[cross]
+        order = np.lexsort((name_arr[xd].astype(str), name_arr[xs].astype(str), keys))
+        comp_keys, first = np.unique(keys[order], return_index=True)
+        rep_src, rep_dst = xs[order][first], xd[order][first]
+        cu, cv = comp_keys // n_comp, comp_keys % n_comp
+    keep = _transitive_reduction_mask(n_comp, cu, cv)
+
+    # Intra-SCC edges first, then reduced edges, grouped by source
+    out_src = np.concatenate([in_src, rep_src[keep]])
+    out_dst = np.concatenate([in_dst, rep_dst[keep]])
+    order = np.argsort(out_src, kind="stable")
+    return out_src[order], out_dst[order]
+
+
+def detect_communities_undirected(names: List[str], src: np.ndarray, dst: np.ndarray) -> Dict[str, int]:
+    try:
+        import igraph as ig
+    except ImportError:
+        ig = None
+
+    if ig is not None:
+        # Leiden modularity optimization in C on the integer-encoded undirected graph
+        g = ig.Graph(n=len(names), edges=np.column_stack([src, dst]).tolist(), directed=False)
+        ig.set_random_number_generator(random.Random(42))
+        part = g.community_leiden(objective_function="modularity", n_iterations=10)
+        communities: List[List[str]] = [[names[i] for i in members] for members in part]
+    else:
+        UG = nx.Graph()
+        UG.add_nodes_from(names)
+        UG.add_edges_from((names[u], names[v]) for u, v in zip(src.tolist(), dst.tolist()))
+        communities = [list(c) for c in nx.community.louvain_communities(UG, seed=42)]
+
+    # Largest communities first, as greedy_modularity_communities ordered them
+    communities = [c for c in communities if c]
+    communities.sort(key=len, reverse=True)
     node_to_comm: Dict[str, int] = {}
     for cid, comm in enumerate(communities):
         for v in comm:
             node_to_comm[v] = cid
     # Isolated nodes not included
-    for v in R.nodes():
+    for v in names:
         node_to_comm.setdefault(v, -1)
     return node_to_comm
 
@@ -99,12 +180,13 @@ def palette(n: int) -> List[str]:
     return colors
 
 
-def write_outputs(R: nx.DiGraph, node_to_comm: Dict[str, int], graph_out: str, comm_out: str) -> None:
+def write_outputs(node_data: List[Dict[str, Any]], src: np.ndarray, dst: np.ndarray, node_to_comm: Dict[str, int], graph_out: str, comm_out: str) -> None:
     # Prepare node list with community and color
     max_comm = max(node_to_comm.values()) if node_to_comm else -1
     colors = palette(max_comm + 1)
     nodes: List[Dict[str, Any]] = []
-    for v, data in R.nodes(data=True):
+    for data in node_data:
+        v = data["id"]
         cid = node_to_comm.get(v, -1)
         color = colors[cid] if cid >= 0 else "#4f46e5"
         nodes.append({
@@ -115,20 +197,21 @@ def write_outputs(R: nx.DiGraph, node_to_comm: Dict[str, int], graph_out: str, c
             "subject": data.get("subject"),
         })
 
-    edges: List[Dict[str, Any]] = []
-    for u, v in R.edges():
-        edges.append({"source": u, "target": v, "kind": "hard"})
+    # Integer ids map back to course codes only here
+    names = [data["id"] for data in node_data]
+    edges: List[Dict[str, Any]] = [
+        {"source": names[u], "target": names[v], "kind": "hard"}
+        for u, v in zip(src.tolist(), dst.tolist())
+    ]
 
     os.makedirs(os.path.dirname(graph_out) or ".", exist_ok=True)
-    with open(graph_out, "w", encoding="utf-8") as f:
-        json.dump({"nodes": nodes, "edges": edges}, f, ensure_ascii=False, indent=2)
+    dump_json({"nodes": nodes, "edges": edges}, graph_out)
 
     # communities summary
     comm_map: Dict[int, List[str]] = {}
     for node, cid in node_to_comm.items():
         comm_map.setdefault(cid, []).append(node)
-    with open(comm_out, "w", encoding="utf-8") as f:
-        json.dump({str(k): v for k, v in sorted(comm_map.items())}, f, ensure_ascii=False, indent=2)
+    dump_json({str(k): v for k, v in sorted(comm_map.items())}, comm_out)
 
 
 def main() -> int:
@@ -139,11 +222,12 @@ def main() -> int:
     args = ap.parse_args()
 
     nodes, edges = load_graph(args.input)
-    G = directed_hard_graph(nodes, edges)
-    R = transitive_reduction_with_scc(G)
-    node_to_comm = detect_communities_undirected(R)
-    write_outputs(R, node_to_comm, args.graph_out, args.comm_out)
-    print(f"reduced_nodes={R.number_of_nodes()} reduced_edges={R.number_of_edges()} communities={max(node_to_comm.values())+1}")
+    node_data, src, dst = directed_hard_graph(nodes, edges)
+    names = [data["id"] for data in node_data]
+    r_src, r_dst = transitive_reduction_with_scc(names, src, dst)
+    node_to_comm = detect_communities_undirected(names, r_src, r_dst)
+    write_outputs(node_data, r_src, r_dst, node_to_comm, args.graph_out, args.comm_out)
+    print(f"reduced_nodes={len(names)} reduced_edges={len(r_src)} communities={max(node_to_comm.values())+1}")
     return 0
 
 
@@ -1,8 +1,42 @@
 #!/usr/bin/env python3
-import json
 import sys
+from typing import Any, Callable, List, Tuple
+
 from jsonschema import Draft202012Validator
 
+from jsonio import load_json
+
+
+try:
+    import fastjsonschema
+except ImportError:  # fall back to jsonschema
+    fastjsonschema = None
+
+# Cap printed errors so a bad dump does not flood the terminal
+MAX_ERRORS = 20
+
+
+def compile_validator(schema: Any) -> Callable[[Any], List[Tuple[str, List[Any]]]]:
+    if fastjsonschema is not None:
+        # Generated straight-line checks; stops at the first error per record
+        validate = fastjsonschema.compile(schema)
+
+        def check(rec: Any) -> List[Tuple[str, List[Any]]]:
+            try:
+                validate(rec)
+            except fastjsonschema.JsonSchemaValueException as e:
+                return [(e.message, list(e.path or [])[1:])]
+            return []
+
+        return check
+
+    validator = Draft202012Validator(schema)
+
+    def check(rec: Any) -> List[Tuple[str, List[Any]]]:
+        return [(err.message, list(err.path)) for err in validator.iter_errors(rec)]
+
+    return check
+
 
 def main() -> int:
     if len(sys.argv) != 3:
@@ -10,16 +44,20 @@ def main() -> int:
         return 2
 
     schema_path, data_path = sys.argv[1], sys.argv[2]
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema = json.load(f)
-    with open(data_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    schema = load_json(schema_path)
+    data = load_json(data_path)
 
-    validator = Draft202012Validator(schema)
-    errors = list(validator.iter_errors(data[0] if isinstance(data, list) and data else data))
+    check = compile_validator(schema)
+    records = data if isinstance(data, list) else [data]
+    errors = []
+    for i, rec in enumerate(records):
+        for message, path in check(rec):
+            errors.append((i, message, path))
     if errors:
-        for err in errors:
-            print(f"error: {err.message} at {list(err.path)}")
+        for i, message, path in errors[:MAX_ERRORS]:
+            print(f"error: record {i}: {message} at {path}")
+        if len(errors) > MAX_ERRORS:
+            print(f"... {len(errors) - MAX_ERRORS} more error(s)")
         return 1
     print("ok")
     return 0
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from fetch_uiuc_courses import CourseRecord, JsonlSink, read_records_jsonl, record_sort_key, write_records_json  # noqa: E402
+
+
+# Characters str.splitlines() treats as line breaks but JSON writes raw inside strings
+LINE_SEPARATORS = "\u2028\u2029\x85"
+
+
+def _records():
+    return [
+        CourseRecord("CS 125", "Intro to CS", f"Desc{LINE_SEPARATORS}end", "Prerequisite: CS 100\x85"),
+        CourseRecord("CS 225", None, "Plain \"quoted\"\nnewline", None),
+    ]
+
+
+class WriteRecordsJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "courses.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trips_unicode_line_separators(self):
+        records = _records()
+        write_records_json(records, self.path)
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data, [r.__dict__ for r in records])
+
+    def test_matches_json_dump(self):
+        records = _records()
+        write_records_json(records, self.path)
+        with open(self.path, encoding="utf-8") as f:
+            written = f.read()
+        self.assertEqual(written, json.dumps([r.__dict__ for r in records], ensure_ascii=False, indent=2))
+
+    def test_empty(self):
+        write_records_json([], self.path)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "[]")
+
+
+class JsonlSidecarTest(unittest.TestCase):
+    def test_sidecar_rebuilds_same_json(self):
+        # The .json output is rebuilt from the .jsonl sidecar; it must match a direct write
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl_path = os.path.join(tmp, "courses.jsonl")
+            records = _records()
+            sink = JsonlSink(jsonl_path)
+            sink.write(records[1:])
+            sink.write(records[:1])
+            sink.close()
+            self.assertEqual(sink.count, 2)
+
+            rebuilt = read_records_jsonl(jsonl_path)
+            rebuilt.sort(key=record_sort_key)
+            self.assertEqual(rebuilt, records)
+
+            direct_path = os.path.join(tmp, "direct.json")
+            rebuilt_path = os.path.join(tmp, "rebuilt.json")
+            write_records_json(records, direct_path)
+            write_records_json(rebuilt, rebuilt_path)
+            with open(direct_path, "rb") as a, open(rebuilt_path, "rb") as b:
+                self.assertEqual(a.read(), b.read())
+
+
+if __name__ == "__main__":
+    unittest.main()